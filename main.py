@@ -1,239 +1,45 @@
+import argparse
 import asyncio
+import logging
 import os
 import sys
-from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
+from pathlib import Path
 
-import yaml
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 from dotenv import load_dotenv
 
-from src.data.market_data_store import MarketDataStore
-from src.messages.push_notifications import send_pushover_notification
-from src.session.session_manager import create_session
-from src.subscription.equity_metrics import EquityMetrics
-from src.subscription.market_data_subscription import MarketDataSubscription
-from src.subscription.watch_list_manager import WatchListManager
+from src.app.cli import MODES, run
 
-def load_symbols(source_file):
-    """Load symbols from the source_file file."""
-    try:
-        with open(source_file, 'r') as f:
-            symbols_data = yaml.safe_load(f)
-            return symbols_data
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Symbols file not found: {source_file}")
-    except yaml.YAMLError as err:
-        raise ValueError(f"Invalid YAML in symbols file: {source_file}. Error: {err}")
-
-
-@asynccontextmanager
-async def market_subscription_manager(session, symbols, data_store):
-    """Context manager for market subscription lifecycle"""
-    market_sub = None
-
-    try:
-        # Setup
-        market_sub = MarketDataSubscription(session, symbols, data_store)
-        await market_sub.connect()
-
-        yield market_sub
-
-    finally:
-        # Cleanup - Fixed to prevent recursive cancellation
-        print("Cleaning up resources...")
-        if market_sub:
-            try:
-                # Ensure we don't create recursive task cancellation
-                if hasattr(market_sub, 'stop'):
-                    if asyncio.iscoroutinefunction(market_sub.stop):
-                        await asyncio.wait_for(market_sub.stop(), timeout=5.0)
-                    else:
-                        await market_sub.stop()
-            except asyncio.TimeoutError:
-                print("Warning: Market subscription stop timed out")
-            except Exception as err:
-                print(f"Error stopping streamer: {err}")
-
-        if data_store and hasattr(data_store, 'disconnect'):
-            try:
-                data_store.disconnect()
-            except Exception as err:
-                print(f"Error disconnecting database: {err}")
-
-
-def _get_int_env(name: str, default: int) -> int:
-    raw = os.getenv(name)
-    if raw is None or raw == "":
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        raise ValueError(f"Invalid integer for {name}: {raw!r}")
-
-
-async def main():
-    # Create a shutdown event
-    shutdown_event = asyncio.Event()
-    scheduler = None
-
-    try:
-        # load streaming symbols
-        streaming_symbols = load_symbols('streaming-symbols.yaml')
-        # load nightly symbols
-        nightly_symbols = load_symbols('nightly-symbols.yaml')
-    except Exception as err:
-        print(f"Error loading symbols: {err}")
-        return
-
-    try:
-        # create session
-        session = create_session()
-        # create the data store
-        data_store = MarketDataStore()
-    except Exception as err:
-        print(f"Error creating session: {err}")
-        return
-
-    # Create a closure that captures the variables you need
-    async def daily_task():
-        """Task that runs once daily with access to session, data_store, and symbols"""
-        print(f"Running daily task at {datetime.now()}")
-        send_pushover_notification(f"Running daily task at {datetime.now()}")
-        try:
-            # Custom throttling (25 symbols per batch, 0.5s between calls, 2s between batches)
-            eq_metrics = EquityMetrics(session, data_store)
-            eq_metrics.gather_metrics(
-                nightly_symbols['equities'],
-                symbols_per_batch=25,
-                delay_between_calls=0.5,
-                delay_between_batches=2.0
-            )
-
-            # Add your other daily task logic here
-            print("Daily maintenance task completed successfully")
-            send_pushover_notification("Daily maintenance task completed successfully")
+log = logging.getLogger(__name__)
 
-        except Exception as ex:
-            send_pushover_notification(f"Error in daily task: {ex}")
-            print(f"Error in daily task: {ex}")
+BASE_DIR = Path(__file__).resolve().parent
 
-    try:
-        # Initialize scheduler
-        scheduler = AsyncIOScheduler()
-
-        # get the start time from env
-        cron_hour = _get_int_env("DAILY_TASK_HOUR", 19)
-        cron_minute = _get_int_env("DAILY_TASK_MINUTE", 0)
-        cron_second = _get_int_env("DAILY_TASK_SECOND", 0)
-
-        # Schedule the task using cron syntax
-        scheduler.add_job(
-            daily_task,
-            CronTrigger(hour=cron_hour, minute=cron_minute, second=cron_second),
-            id='daily_task',
-            name='Daily Maintenance Task',
-            max_instances=1  # Prevent overlapping executions
-        )
-
-        # create a subscription
-        indices_list = streaming_symbols['indices']
-        async with market_subscription_manager(session, indices_list, data_store):
-            print("Streamer is running. Press Ctrl+C to stop.")
-
-            # Start the scheduler
-            scheduler.start()
-            print("Daily task scheduled successfully")
-
-            # Wait for the shutdown signal (Ctrl+C will naturally raise KeyboardInterrupt)
-            try:
-                await shutdown_event.wait()
-            except KeyboardInterrupt:
-                print("\nKeyboard interrupt received in wait loop")
-                raise
-
-    except KeyboardInterrupt:
-        print("\nShutdown requested. Exiting Script...")
-    except Exception as err:
-        print(f"Error in main execution: {err}")
-    finally:
-        # Proper cleanup of scheduler
-        if scheduler and scheduler.running:
-            print("Shutting down scheduler...")
-            try:
-                scheduler.shutdown(wait=False)  # Don't wait to prevent deadlock
-            except Exception as err:
-                print(f"Error shutting down scheduler: {err}")
-
-async def collect_history():
-    try:
-        # load nightly symbols
-        nightly_symbols = load_symbols('nightly-symbols.yaml')
-    except Exception as err:
-        print(f"Error loading symbols: {err}")
-        return
-
-    try:
-        # create session
-        session = create_session()
-        # create the data store
-        data_store = MarketDataStore()
-    except Exception as err:
-        print(f"Error creating session: {err}")
-        return
-
-    # Set your symbol, interval, and time range
-    interval = "1d"
-    start = datetime.now() - timedelta(days=2)
-    end = datetime.now()
-
-    market_sub = MarketDataSubscription(session, nightly_symbols, data_store)
-    print(f"Downloading historical data from {start.date()} to {end.date()}...")
 
-    symbols = nightly_symbols["equities"]
-    batch_size = 25
-    delay_between_batches = 2.0  # optional
-
-    for i in range(0, len(symbols), batch_size):
-        batch = symbols[i : i + batch_size]
-        print(f"Downloading batch {i // batch_size + 1} ({len(batch)} symbols)...")
-        await market_sub.download_historical_data(session, batch, interval, start, end)
-
-        if i + batch_size < len(symbols):
-            await asyncio.sleep(delay_between_batches)
-
-
-async def watch_lists():
-    try:
-        # create session
-        session = create_session()
-        # create the data store
-        data_store = MarketDataStore()
-    except Exception as err:
-        print(f"Error creating session: {err}")
-        return
+def parse_args():
+    parser = argparse.ArgumentParser(description="Collect market data from Tastytrade into PostgreSQL")
+    parser.add_argument('mode', nargs='?', default='stream', type=str.lower, choices=MODES,
+                        help="stream (default), history or watchlists")
+    parser.add_argument('--streaming-symbols', type=Path, default=BASE_DIR / 'streaming-symbols.yaml',
+                        help="YAML file with the symbols to stream")
+    parser.add_argument('--nightly-symbols', type=Path, default=BASE_DIR / 'nightly-symbols.yaml',
+                        help="YAML file with the symbols for the nightly metrics task")
+    return parser.parse_args()
 
-    watch_list_manager = WatchListManager(session, data_store)
-    await watch_list_manager.load_watch_list_data()
 
 if __name__ == "__main__":
+    args = parse_args()
     load_dotenv()
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s %(name)s %(levelname)s %(message)s',
+        stream=sys.stderr
+    )
     # send_pushover_notification("The MarketData container has started successfully!")
 
     try:
-        if len(sys.argv) > 1 and sys.argv[1].lower() == "history":
-            # collect historical data
-            asyncio.run(collect_history())
-        elif len(sys.argv) > 1 and sys.argv[1].lower() == "watchlists":
-            # get the public watch lists
-            asyncio.run(watch_lists())
-        else:
-            # processing data
-            asyncio.run(main())
+        asyncio.run(run(args.mode, args.streaming_symbols, args.nightly_symbols))
     except KeyboardInterrupt:
-        print("\nApplication interrupted gracefully")
+        log.info("Application interrupted gracefully")
     except Exception as e:
-        print(f"Application error: {e}")
+        log.exception("Application error: %s", e)
     finally:
-        print("Application shutdown complete")
\ No newline at end of file
+        log.info("Application shutdown complete")
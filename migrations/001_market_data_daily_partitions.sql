@@ -0,0 +1,118 @@
+-- Convert market_data into a table partitioned by trading day, with the
+-- current day's partition UNLOGGED for faster streaming inserts.
+--
+-- DURABILITY TRADEOFF
+--   UNLOGGED partitions skip the write-ahead log. Inserts are much cheaper,
+--   but after a crash or unclean Postgres shutdown every UNLOGGED partition
+--   is TRUNCATED on recovery, and UNLOGGED tables are not replicated to
+--   standbys. Only the current (and next) trading day are kept UNLOGGED. The
+--   end-of-day job calls market_data_rotate_partitions(<next day>), which
+--   runs ALTER TABLE ... SET LOGGED on every partition before that day,
+--   including the day that just closed. SET LOGGED rewrites the partition and
+--   WAL-logs it in full, so after rotation the data is as durable as any
+--   other table. Anything lost from the current day has to be re-downloaded
+--   from the broker (main.py history).
+--
+--   Rows for a day without a partition (e.g. a missed rotation) land in the
+--   LOGGED market_data_default partition instead of failing; they are moved
+--   into the day's partition when it is created.
+--
+--   Enable the rotation job with MARKET_DATA_PARTITIONED=true once this
+--   migration has been applied.
+--
+-- APPLYING
+--   Apply before the first candle of the trading day (e.g. before the
+--   streamer starts). The existing table is attached as the partition for
+--   everything before today, and the ATTACH aborts if it already holds rows
+--   from today.
+--
+-- ASSUMPTIONS
+--   market_data.time holds the DXLink candle timestamp in epoch milliseconds.
+--   Day boundaries are midnight America/New_York.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION market_data_day_start_ms(day date) RETURNS bigint
+    LANGUAGE sql IMMUTABLE AS
+$$
+SELECT (extract(epoch FROM (day::timestamp AT TIME ZONE 'America/New_York')) * 1000)::bigint
+$$;
+
+-- Create the UNLOGGED partition for a day if it does not exist yet, moving in any
+-- rows for that day that landed in the default partition; returns its name.
+CREATE OR REPLACE FUNCTION market_data_ensure_partition(day date) RETURNS text
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    partition_name text := 'market_data_' || to_char(day, 'YYYYMMDD');
+    day_start bigint := market_data_day_start_ms(day);
+    day_end bigint := market_data_day_start_ms(day + 1);
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format('CREATE UNLOGGED TABLE %I (LIKE market_data INCLUDING DEFAULTS)', partition_name);
+        -- ATTACH refuses while the default partition holds rows in the new range
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM market_data_default WHERE time >= %s AND time < %s RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            day_start, day_end, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE market_data ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+            partition_name, day_start, day_end
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$;
+
+-- Rotation: make sure partitions exist for `day` and the next day, and switch
+-- every earlier UNLOGGED partition to LOGGED. At startup `day` is today; at end
+-- of day it is tomorrow, so the day that just closed becomes durable.
+CREATE OR REPLACE FUNCTION market_data_rotate_partitions(day date) RETURNS void
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    part record;
+BEGIN
+    PERFORM market_data_ensure_partition(day);
+    PERFORM market_data_ensure_partition(day + 1);
+
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+                 JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'market_data'::regclass
+          AND c.relpersistence = 'u'
+          AND c.relname < 'market_data_' || to_char(day, 'YYYYMMDD')
+        LOOP
+            EXECUTE format('ALTER TABLE %I SET LOGGED', part.relname);
+        END LOOP;
+END;
+$$;
+
+-- Keep the existing rows as a regular (logged) partition covering everything
+-- before today, and put the partitioned table in its place.
+ALTER TABLE market_data RENAME TO market_data_legacy;
+
+CREATE TABLE market_data (LIKE market_data_legacy INCLUDING DEFAULTS)
+    PARTITION BY RANGE (time);
+
+DO
+$$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE market_data ATTACH PARTITION market_data_legacy FOR VALUES FROM (MINVALUE) TO (%s)',
+        market_data_day_start_ms((now() AT TIME ZONE 'America/New_York')::date)
+    );
+END;
+$$;
+
+-- Catch rows for days without a partition rather than rejecting them.
+CREATE TABLE market_data_default PARTITION OF market_data DEFAULT;
+
+-- Indexes on the parent are created on every partition, including future ones.
+CREATE INDEX IF NOT EXISTS market_data_event_symbol_time_idx ON market_data (event_symbol, time);
+
+SELECT market_data_rotate_partitions((now() AT TIME ZONE 'America/New_York')::date);
+
+COMMIT;
@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import os
+import signal
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.app.symbols import load_symbols_async
+from src.data.db_pool import close_pool
+from src.data.market_data_store import MarketDataStore
+from src.messages.push_notifications import send_pushover_notification
+from src.session.session_manager import create_session
+from src.subscription.market_data_subscription import MarketDataSubscription
+
+log = logging.getLogger(__name__)
+
+MODES = ('stream', 'history', 'watchlists')
+
+# Partition rotation runs on New York wall-clock time, matching the trading days partitions are cut on
+MARKET_TIMEZONE = 'America/New_York'
+
+
+@asynccontextmanager
+async def market_subscription_manager(session, symbols, data_store):
+    """Context manager for market subscription lifecycle"""
+    market_sub = None
+    flush_task = None
+
+    try:
+        # Setup
+        market_sub = MarketDataSubscription(session, symbols, data_store)
+        await market_sub.connect()
+
+        # Periodically flush buffered candle rows so quiet symbols still get written
+        flush_task = asyncio.create_task(data_store.run_periodic_flush())
+
+        yield market_sub
+
+    finally:
+        # Cleanup - Fixed to prevent recursive cancellation
+        log.info("Cleaning up resources...")
+        if flush_task:
+            flush_task.cancel()
+            try:
+                await flush_task
+            except asyncio.CancelledError:
+                pass
+
+        if market_sub:
+            try:
+                # Ensure we don't create recursive task cancellation
+                if hasattr(market_sub, 'stop'):
+                    if asyncio.iscoroutinefunction(market_sub.stop):
+                        await asyncio.wait_for(market_sub.stop(), timeout=5.0)
+                    else:
+                        await market_sub.stop()
+            except asyncio.TimeoutError:
+                log.warning("Market subscription stop timed out")
+            except Exception as err:
+                log.exception("Error stopping streamer: %s", err)
+
+        if data_store and hasattr(data_store, 'disconnect'):
+            try:
+                data_store.disconnect()
+            except Exception as err:
+                log.exception("Error disconnecting database: %s", err)
+
+
+def _get_int_env(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f"Invalid integer for {name}: {raw!r}")
+
+
+def _get_bool_env(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _add_signal_handler(loop, name: str, callback) -> bool:
+    """Register a loop signal handler, returning False where the platform or loop doesn't support it"""
+    sig = getattr(signal, name, None)
+    if sig is None:
+        return False
+    try:
+        loop.add_signal_handler(sig, callback)
+    except (NotImplementedError, RuntimeError):
+        return False
+    return True
+
+
+async def stream(streaming_yaml: Path, nightly_yaml: Path):
+    """Stream candle data for the streaming symbols and run the nightly metrics task on a schedule"""
+    # Create a shutdown event
+    shutdown_event = asyncio.Event()
+    scheduler = None
+
+    try:
+        # load streaming symbols
+        streaming_symbols = await load_symbols_async(streaming_yaml)
+        # load nightly symbols
+        nightly_symbols = await load_symbols_async(nightly_yaml)
+    except Exception as err:
+        log.exception("Error loading symbols: %s", err)
+        return
+
+    try:
+        # create session
+        session = create_session()
+        # create the data store
+        data_store = MarketDataStore()
+    except Exception as err:
+        log.exception("Error creating session: %s", err)
+        return
+
+    # Create a closure that captures the variables you need
+    async def daily_task():
+        """Task that runs once daily with access to session, data_store, and symbols"""
+        log.info("Running daily task at %s", datetime.now())
+        await asyncio.to_thread(send_pushover_notification, f"Running daily task at {datetime.now()}")
+        try:
+            # Reuse the shared data store, reconnecting only if its connection dropped during the day.
+            # The liveness checks can wait on an in-flight candle flush, so keep them off the event loop
+            await asyncio.to_thread(data_store.ensure_connected)
+
+            from src.subscription.equity_metrics import EquityMetrics
+
+            # Custom throttling (25 symbols per batch, 0.5s between calls, 2s between batches)
+            eq_metrics = EquityMetrics(session, data_store)
+            await eq_metrics.gather_metrics_async(
+                nightly_symbols['equities'],
+                symbols_per_batch=25,
+                delay_between_calls=0.5,
+                delay_between_batches=2.0
+            )
+
+            # Add your other daily task logic here
+            log.info("Daily maintenance task completed successfully")
+            await asyncio.to_thread(send_pushover_notification, "Daily maintenance task completed successfully")
+
+        except Exception as ex:
+            await asyncio.to_thread(send_pushover_notification, f"Error in daily task: {ex}")
+            log.exception("Error in daily task: %s", ex)
+
+    try:
+        # Deferred so the history and watchlists modes don't pay for loading the scheduler
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        from apscheduler.triggers.cron import CronTrigger
+
+        # Initialize scheduler; late runs within the grace window still execute, collapsed into one
+        scheduler = AsyncIOScheduler(job_defaults={
+            'coalesce': True,
+            'misfire_grace_time': _get_int_env("DAILY_TASK_MISFIRE_GRACE", 3600),
+            'max_instances': 1,
+        })
+
+        # get the start time from env
+        cron_hour = _get_int_env("DAILY_TASK_HOUR", 19)
+        cron_minute = _get_int_env("DAILY_TASK_MINUTE", 0)
+        cron_second = _get_int_env("DAILY_TASK_SECOND", 0)
+
+        # Schedule the task using cron syntax
+        scheduler.add_job(
+            daily_task,
+            CronTrigger(hour=cron_hour, minute=cron_minute, second=cron_second),
+            id='daily_task',
+            name='Daily Maintenance Task',
+            max_instances=1,  # Prevent overlapping executions
+            replace_existing=True
+        )
+
+        # With daily UNLOGGED partitions (migrations/001), today's partition must exist before streaming,
+        # and each evening the finished day is made durable
+        if _get_bool_env("MARKET_DATA_PARTITIONED"):
+            data_store.rotate_partitions()
+            scheduler.add_job(
+                data_store.close_day,
+                CronTrigger(hour=_get_int_env("PARTITION_ROTATE_HOUR", 17),
+                            minute=_get_int_env("PARTITION_ROTATE_MINUTE", 0),
+                            timezone=MARKET_TIMEZONE),
+                id='rotate_partitions',
+                name='Rotate market_data Partitions',
+                replace_existing=True
+            )
+
+        # create a subscription
+        indices_list = streaming_symbols['indices']
+        async with market_subscription_manager(session, indices_list, data_store) as market_sub:
+            log.info("Streamer is running. Press Ctrl+C to stop.")
+
+            # Start the scheduler
+            scheduler.start()
+            log.info("Daily task scheduled successfully")
+
+            async def reload_symbols():
+                """Re-read both symbol files and apply streaming changes to the live subscription"""
+                nonlocal nightly_symbols
+                try:
+                    reloaded_streaming = await load_symbols_async(streaming_yaml)
+                    nightly_symbols = await load_symbols_async(nightly_yaml)
+
+                    new_indices = reloaded_streaming['indices']
+                    current = set(market_sub.symbols)
+                    await market_sub.update_symbols(
+                        add=[symbol for symbol in new_indices if symbol not in current],
+                        remove=[symbol for symbol in current if symbol not in new_indices]
+                    )
+                    log.info("Symbols reloaded: streaming %s, nightly %s",
+                             len(new_indices), len(nightly_symbols['equities']))
+                except Exception as ex:
+                    log.exception("Error reloading symbols: %s", ex)
+
+            # Keep references so reload tasks are not garbage collected mid-run
+            reload_tasks = set()
+
+            def on_reload_signal():
+                task = asyncio.create_task(reload_symbols())
+                reload_tasks.add(task)
+                task.add_done_callback(reload_tasks.discard)
+
+            # Wait for SIGINT/SIGTERM to set the shutdown event; SIGHUP reloads the symbol files
+            loop = asyncio.get_running_loop()
+            for name in ('SIGINT', 'SIGTERM'):
+                _add_signal_handler(loop, name, shutdown_event.set)
+            _add_signal_handler(loop, 'SIGHUP', on_reload_signal)
+            await shutdown_event.wait()
+            log.info("Shutdown requested. Exiting Script...")
+
+    except KeyboardInterrupt:
+        log.info("Shutdown requested. Exiting Script...")
+    except Exception as err:
+        log.exception("Error in main execution: %s", err)
+    finally:
+        # Proper cleanup of scheduler
+        if scheduler and scheduler.running:
+            log.info("Shutting down scheduler...")
+            try:
+                scheduler.shutdown(wait=False)  # Don't wait to prevent deadlock
+            except Exception as err:
+                log.exception("Error shutting down scheduler: %s", err)
+
+async def collect_history(nightly_yaml: Path):
+    """Download recent daily candles for the nightly symbols"""
+    try:
+        # load nightly symbols
+        nightly_symbols = await load_symbols_async(nightly_yaml)
+    except Exception as err:
+        log.exception("Error loading symbols: %s", err)
+        return
+
+    try:
+        # create session
+        session = create_session()
+        # create the data store
+        data_store = MarketDataStore()
+    except Exception as err:
+        log.exception("Error creating session: %s", err)
+        return
+
+    # Set your symbol, interval, and time range
+    interval = "1d"
+    start = datetime.now() - timedelta(days=2)
+    end = datetime.now()
+
+    market_sub = MarketDataSubscription(session, nightly_symbols, data_store)
+    log.info("Downloading historical data from %s to %s...", start.date(), end.date())
+
+    symbols = nightly_symbols["equities"]
+    batch_size = 25
+    delay_between_batches = 2.0  # optional
+
+    for i in range(0, len(symbols), batch_size):
+        batch = symbols[i : i + batch_size]
+        log.info("Downloading batch %s (%s symbols)...", i // batch_size + 1, len(batch))
+        await market_sub.download_historical_data(session, batch, interval, start, end)
+
+        if i + batch_size < len(symbols):
+            await asyncio.sleep(delay_between_batches)
+
+
+async def watch_lists():
+    """Load the public watch lists"""
+    try:
+        # create session
+        session = create_session()
+        # create the data store
+        data_store = MarketDataStore()
+    except Exception as err:
+        log.exception("Error creating session: %s", err)
+        return
+
+    from src.subscription.watch_list_manager import WatchListManager
+
+    watch_list_manager = WatchListManager(session, data_store)
+    await watch_list_manager.load_watch_list_data()
+
+
+async def run(mode: str, streaming_yaml: Path, nightly_yaml: Path):
+    """
+    Run the collector in the given mode.
+
+    Args:
+        mode: One of MODES
+        streaming_yaml: Path to the streaming symbols file
+        nightly_yaml: Path to the nightly symbols file
+    """
+    try:
+        if mode == 'history':
+            # collect historical data
+            await collect_history(nightly_yaml)
+        elif mode == 'watchlists':
+            # get the public watch lists
+            await watch_lists()
+        elif mode == 'stream':
+            # processing data
+            await stream(streaming_yaml, nightly_yaml)
+        else:
+            raise ValueError(f"Unknown mode: {mode!r}. Expected one of {', '.join(MODES)}")
+    finally:
+        close_pool()
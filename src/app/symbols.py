@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+SYMBOLS_CACHE_DIR = os.getenv('SYMBOLS_CACHE_DIR', os.path.expanduser('~/.cache/marketdata'))
+
+# Relative symbol file paths are resolved against the project root, not the working directory
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Parsed files already loaded by this process, keyed like the on-disk cache
+_loaded: dict[str, object] = {}
+
+
+def validate_symbols(data, path) -> dict:
+    """
+    Check that a parsed symbols file maps group names (e.g. 'indices', 'equities') to lists of symbols.
+
+    Args:
+        data: Parsed YAML content
+        path: Path the content was read from, for error messages
+
+    Returns:
+        The validated data
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Symbols file {path} must contain a mapping of symbol groups")
+
+    for group, symbols in data.items():
+        if not isinstance(symbols, list) or not all(isinstance(symbol, str) for symbol in symbols):
+            raise ValueError(f"Symbol group '{group}' in {path} must be a list of symbols")
+
+    return data
+
+
+def _cached_yaml_load(path):
+    """
+    Load a YAML file, reusing a pickled copy of the parsed result while the file is unchanged.
+
+    Args:
+        path: Path to the YAML file
+
+    Returns:
+        Parsed YAML content
+    """
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+    if key in _loaded:
+        return _loaded[key]
+
+    cache_file = os.path.join(SYMBOLS_CACHE_DIR, hashlib.sha256(key.encode()).hexdigest() + '.pkl')
+
+    try:
+        with open(cache_file, 'rb') as f:
+            data = _loaded[key] = pickle.load(f)
+            return data
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    # yaml is only imported on a cache miss; warm starts never load the parser
+    import yaml
+    try:
+        from yaml import CSafeLoader as Loader
+    except ImportError:
+        from yaml import SafeLoader as Loader
+
+    try:
+        # Binary mode lets libyaml handle decoding itself
+        with open(path, 'rb') as f:
+            data = yaml.load(f, Loader=Loader)
+    except yaml.YAMLError as err:
+        raise ValueError(f"Invalid YAML in symbols file: {path}. Error: {err}")
+
+    # Only validated content is memoized or written to the cache
+    data = _loaded[key] = validate_symbols(data, path)
+
+    # Write to a temp file and rename it so readers never see a partial cache entry
+    try:
+        os.makedirs(SYMBOLS_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SYMBOLS_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except OSError as err:
+        log.warning("Unable to cache symbols file %s: %s", path, err)
+
+    return data
+
+
+def load_symbols(source_file):
+    """Load symbols from the source_file file."""
+    symbols_file = PROJECT_ROOT / source_file
+    try:
+        return _cached_yaml_load(symbols_file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Symbols file not found: {symbols_file}")
+
+
+async def load_symbols_async(source_file):
+    """Load symbols on a worker thread so file I/O and parsing never block the event loop."""
+    return await asyncio.to_thread(load_symbols, source_file)
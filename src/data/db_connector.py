@@ -1,51 +1,105 @@
-import os
-import platform
+import csv
+import io
+import logging
 import psycopg2
-from typing import Any
-from psycopg2.extras import DictCursor, execute_values
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Sequence
+from psycopg2.extras import DictCursor, execute_batch, execute_values
+
+from src.data.db_pool import get_pool, release_connection
+
+log = logging.getLogger(__name__)
 
 
 class DatabaseConnector:
-    """Class responsible for PostgreSQL database connections"""
-
-    def __init__(self):
-        # get the current OS
-        current_os = platform.system().upper()
-
-        # Database configuration
-        self.db_params = {
-            'dbname': os.getenv('DB_NAME', 'postgres'),
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD'),
-            'host': os.getenv('DB_' + current_os + '_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432')
-        }
+    """Class responsible for a PostgreSQL connection checked out from the shared pool"""
+
+    def __init__(self, commit_every: int = 1, synchronous_commit: bool = True):
+        """
+        Args:
+            commit_every: Commit after this many write batches instead of after each one
+            synchronous_commit: Set to False to let commits return before the WAL is flushed to disk.
+                Suitable for data that can be re-downloaded; a server crash may lose the last few commits.
+        """
+        self.commit_every = commit_every
+        self.synchronous_commit = synchronous_commit
         self.connection = None
+        # DictCursor for reads; plain cursor for writes that never fetch rows
         self.cursor = None
+        self.write_cursor = None
+        # Prepared statements by name, as (sql, parameter count); re-prepared on every connect
+        self._prepared: dict[str, tuple[str, int]] = {}
+        # Write batches executed since the last commit
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
 
 
     def connect(self) -> None:
-        """Establish connection to the PostgreSQL database"""
+        """Check out a connection to the PostgreSQL database from the pool"""
         try:
-            self.connection = psycopg2.connect(**self.db_params)
+            self.connection = get_pool().getconn()
             self.cursor = self.connection.cursor(cursor_factory=DictCursor)
-            print("Successfully connected to the database")
+            self.write_cursor = self.connection.cursor()
+            self._pending_writes = 0
+            if not self.synchronous_commit:
+                self.write_cursor.execute("SET synchronous_commit = off")
+                self.connection.commit()
+            for name, (sql, _) in self._prepared.items():
+                self._prepare_statement(name, sql)
+            log.info("Successfully connected to the database")
         except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
+            log.exception("Error connecting to the database: %s", e)
             raise
 
 
     def disconnect(self) -> None:
-        """Close the database connection"""
+        """Reset the session state and return the connection to the pool"""
+        if not self.connection:
+            return
+
+        broken = False
         try:
             if self.cursor:
                 self.cursor.close()
-            if self.connection:
-                self.connection.close()
-                print("Database connection closed")
+            if self.write_cursor:
+                self.write_cursor.close()
+
+            # Drop prepared statements and session settings before another connector reuses the connection
+            if not self.connection.closed:
+                self.commit()
+                self.connection.rollback()
+                self.connection.autocommit = True
+                with self.connection.cursor() as cursor:
+                    cursor.execute("DISCARD ALL")
+                self.connection.autocommit = False
         except psycopg2.Error as e:
-            print(f"Error disconnecting from the database: {e}")
+            broken = True
+            log.exception("Error disconnecting from the database: %s", e)
             raise
+        finally:
+            release_connection(self.connection, close=broken or bool(self.connection.closed))
+            self.connection = None
+            self.cursor = None
+            self.write_cursor = None
+            log.info("Database connection returned to pool")
+
+
+    def ensure_connected(self) -> None:
+        """Reuse the current connection if it is still alive, otherwise check out a new one"""
+        if self.connection and not self.connection.closed:
+            try:
+                self.write_cursor.execute("SELECT 1")
+                self.connection.commit()
+                self._pending_writes = 0
+                return
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                log.warning("Database connection lost, reconnecting: %s", e)
+
+        if self.connection:
+            release_connection(self.connection, close=True)
+            self.connection = None
+        self.connect()
 
 
     def execute_query(self, query: str, params: tuple = None) -> Any:
@@ -63,30 +117,163 @@ class DatabaseConnector:
             self.cursor.execute(query, params)
             if query.strip().upper().startswith(('SELECT', 'SHOW')):
                 return self.cursor.fetchall()
-            self.connection.commit()
+            self.commit()
             return None
         except psycopg2.Error as e:
             self.connection.rollback()
-            print(f"Error executing query: {e}")
+            log.exception("Error executing query: %s", e)
+            raise
+
+    def execute_write(self, query: str, params: tuple = None) -> None:
+        """
+        Execute a SQL statement that returns no rows and commit it.
+
+        Args:
+            query: SQL statement string
+            params: Optional tuple of parameters for the statement
+        """
+        try:
+            with self._write() as cursor:
+                cursor.execute(query, params)
+        except psycopg2.Error as e:
+            log.exception("Error executing statement: %s", e)
+            raise
+
+    @contextmanager
+    def _write(self):
+        """
+        Wrap a write batch, committing once commit_every batches are pending.
+
+        While earlier batches are still uncommitted, the batch runs under a savepoint so a failure
+        only discards its own rows rather than everything since the last commit.
+        """
+        use_savepoint = self._pending_writes > 0
+        if use_savepoint:
+            self.write_cursor.execute("SAVEPOINT pending_write")
+        try:
+            yield self.write_cursor
+        except psycopg2.Error as e:
+            try:
+                if use_savepoint:
+                    self.write_cursor.execute("ROLLBACK TO SAVEPOINT pending_write")
+                else:
+                    self.connection.rollback()
+            except psycopg2.Error as rollback_error:
+                # e.g. the connection dropped; report the error that caused the rollback, not this one
+                log.warning("Rollback after failed write also failed: %s", rollback_error)
+            raise e
+
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Commit the current transaction, including any write batches still pending.
+
+        If the commit fails, every pending batch is lost with the transaction; the count is logged
+        and the pending state reset before the error is re-raised.
+        """
+        try:
+            self.connection.commit()
+        except psycopg2.Error as e:
+            if self._pending_writes:
+                log.error("Commit failed; %s uncommitted write batch(es) were rolled back: %s", self._pending_writes, e)
+            self._pending_writes = 0
+            try:
+                self.connection.rollback()
+            except psycopg2.Error:
+                pass  # connection is gone; nothing left to roll back
             raise
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+
+    def commit_if_older_than(self, max_age: float) -> None:
+        """
+        Commit pending writes if the last commit is more than max_age seconds old.
+
+        Bounds how long rows can sit uncommitted when commit_every batches have not yet accumulated.
+        """
+        if self._pending_writes and time.monotonic() - self._last_commit >= max_age:
+            self.commit()
 
-    def execute_many(self, query: str, params_list: list[tuple], page_size: int = 1000) -> None:
+    def execute_many(self, query: str, params_iter: Iterable[tuple], page_size: int = 1000) -> None:
         """
         Bulk execute for INSERT statements using psycopg2.extras.execute_values.
 
         Expects `query` to be an INSERT with a single VALUES %s placeholder, e.g.:
             INSERT INTO table (a,b,c) VALUES %s
+
+        `params_iter` may be a generator; rows are consumed one page at a time.
         """
-        if not params_list:
+        if not params_iter:
             return
 
+        with self._write() as cursor:
+            execute_values(cursor, query, params_iter, page_size=page_size)
+
+    def prepare(self, name: str, sql: str, param_count: int) -> None:
+        """
+        Register a server-side prepared statement for this connection.
+
+        Postgres parses and plans the statement once; later executions only bind parameters.
+
+        Args:
+            name: Statement name used with EXECUTE
+            sql: Statement text using $1..$n placeholders
+            param_count: Number of parameters the statement takes
+        """
+        self._prepared[name] = (sql, param_count)
+        if self.connection:
+            self._prepare_statement(name, sql)
+
+    def _prepare_statement(self, name: str, sql: str) -> None:
         try:
-            execute_values(self.cursor, query, params_list, page_size=page_size)
+            self.write_cursor.execute(f"PREPARE {name} AS {sql}")
             self.connection.commit()
-        except psycopg2.Error:
+        except psycopg2.Error as e:
             self.connection.rollback()
+            log.exception("Error preparing statement %s: %s", name, e)
             raise
 
+    def execute_prepared(self, name: str, params_iter: Iterable[tuple], page_size: int = 1000) -> None:
+        """
+        Execute a prepared statement once per parameter tuple, sending up to page_size executions per round-trip.
+
+        Args:
+            name: Name of a statement registered with prepare()
+            params_iter: Iterable of parameter tuples, consumed one page at a time
+            page_size: Maximum number of executions sent to the server at once
+        """
+        if not params_iter:
+            return
+
+        _, param_count = self._prepared[name]
+        query = f"EXECUTE {name} ({', '.join(['%s'] * param_count)})"
+        with self._write() as cursor:
+            execute_batch(cursor, query, params_iter, page_size=page_size)
+
+    def copy_rows(self, table: str, columns: Sequence[str], rows: Iterable[tuple]) -> None:
+        """
+        Bulk load rows with COPY ... FROM STDIN, bypassing per-statement parsing and planning.
+
+        Rows are serialized as CSV with NULL written as \\N, so empty strings and NULLs stay distinct.
+
+        Args:
+            table: Target table name
+            columns: Column names matching the order of values in each row
+            rows: Iterable of value tuples
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if value is None else value for value in row])
+        buffer.seek(0)
+
+        copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        with self._write() as cursor:
+            cursor.copy_expert(copy_sql, buffer)
+
 
     def __enter__(self):
         """Context manager entry point"""
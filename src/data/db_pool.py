@@ -0,0 +1,71 @@
+import logging
+import os
+import platform
+import threading
+from typing import Optional
+
+from psycopg2.pool import ThreadedConnectionPool
+
+log = logging.getLogger(__name__)
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _db_params() -> dict:
+    """Build the PostgreSQL connection parameters from the environment"""
+    # get the current OS
+    current_os = platform.system().upper()
+
+    return {
+        'dbname': os.getenv('DB_NAME', 'postgres'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_' + current_os + '_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432')
+    }
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    The pool is created lazily so the environment (.env) is loaded before the parameters are read.
+    Pool bounds come from DB_POOL_MIN (default 2) and DB_POOL_MAX (default 8).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(
+                int(os.getenv('DB_POOL_MIN', '2')),
+                int(os.getenv('DB_POOL_MAX', '8')),
+                **_db_params()
+            )
+        return _pool
+
+
+def release_connection(connection, close: bool = False) -> None:
+    """
+    Return a connection to the pool, or close it if the pool has already been shut down.
+
+    Args:
+        connection: Connection obtained from get_pool().getconn()
+        close: Discard the connection instead of keeping it for reuse
+    """
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.putconn(connection, close=close)
+            return
+
+    if not connection.closed:
+        connection.close()
+
+
+def close_pool() -> None:
+    """Close every connection held by the pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+            log.info("Database connection pool closed")
+        _pool = None
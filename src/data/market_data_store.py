@@ -1,67 +1,257 @@
-from datetime import timezone, datetime
-from typing import Dict, List, Any
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date, timezone, datetime, timedelta
+from typing import Dict, Iterable, List, Any, Optional
+from zoneinfo import ZoneInfo
+
 from src.data.db_connector import DatabaseConnector
 
+log = logging.getLogger(__name__)
+
+# Column order of the market_data rows built by store_candle_data
+CANDLE_COLUMNS = (
+    'event_type', 'event_symbol', 'time', 'open', 'high', 'low', 'close', 'volume',
+    'bid_volume', 'ask_volume', 'imp_volatility', 'iv_index', 'iv_index_5_day_change',
+    'iv_index_rank', 'tos_iv_index_rank', 'tw_iv_index_rank', 'iv_percentile',
+    'liquidity_rating', 'beta', 'corr_spy_3month', 'liquidity_value', 'liquidity_rank',
+)
+
+# Candle values stored as floats regardless of the numeric type they arrive as
+_CANDLE_FLOAT_INDEXES = tuple(
+    CANDLE_COLUMNS.index(column) for column in ('volume', 'bid_volume', 'ask_volume', 'imp_volatility')
+)
+
+# Multi-row INSERT used for bulk candle loads; execute_values expands the single VALUES %s
+INSERT_CANDLE_VALUES_SQL = f"INSERT INTO market_data ({', '.join(CANDLE_COLUMNS)}) VALUES %s"
+
+# Column order of the equity_data rows built by store_metric_data
+METRIC_COLUMNS = (
+    'symbol', 'bid', 'ask', 'last_price', 'close_price', 'volume',
+    'implied_volatility_index', 'implied_volatility_index_rank', 'implied_volatility_percentile',
+    'liquidity_rating', 'liquidity_value', 'implied_volatility_30_day', 'historical_volatility_30_day',
+    'iv_hv_30_day_difference', 'historical_volatility_60_day', 'historical_volatility_90_day', 'beta',
+    'earnings_expected_report_date', 'earnings_time_of_day',
+)
+
+def _to_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+# (metrics dict key, converter) for each METRIC_COLUMNS entry; dates and strings are kept as-is
+_METRIC_PARAM_FIELDS = (
+    ('symbol', None), ('bid', _to_float), ('ask', _to_float), ('last_price', _to_float),
+    ('close_price', _to_float), ('volume', _to_int), ('iv_index', _to_float), ('iv_rank', _to_float),
+    ('iv_percentile', _to_float), ('liquidity_rating', _to_float), ('liquidity_value', _to_float),
+    ('iv_30_day', _to_float), ('hv_30_day', _to_float), ('iv_hv_difference', _to_float),
+    ('hv_60_day', _to_float), ('hv_90_day', _to_float), ('beta', _to_float),
+    ('earnings_expected_date', None), ('earnings_time_of_day', None),
+)
+
+# Multi-row INSERT used for bulk metric loads
+INSERT_METRIC_VALUES_SQL = f"INSERT INTO equity_data ({', '.join(METRIC_COLUMNS)}) VALUES %s"
+
+# Single-row INSERT statements, built once at import
+INSERT_CANDLE_SQL = (f"INSERT INTO market_data ({', '.join(CANDLE_COLUMNS)}) "
+                     f"VALUES ({', '.join(f'${i}' for i in range(1, len(CANDLE_COLUMNS) + 1))})")
+INSERT_METRIC_SQL = (f"INSERT INTO equity_data ({', '.join(METRIC_COLUMNS)}) "
+                     f"VALUES ({', '.join(f'${i}' for i in range(1, len(METRIC_COLUMNS) + 1))})")
+INSERT_METRIC_HISTORY_SQL = """
+                            INSERT INTO equity_data (symbol, close_price, volume, created_date)
+                            VALUES %s
+                            ON CONFLICT (symbol, created_date) DO NOTHING
+                            """
+
+# Names of the server-side prepared statements used for single-row inserts
+CANDLE_INSERT_STATEMENT = 'candle_ins'
+METRIC_INSERT_STATEMENT = 'metric_ins'
+
+# Maximum number of idle candle dictionaries kept for reuse
+ROW_POOL_SIZE = 256
+
+# Streaming candle writes are committed every few flushes, but never left uncommitted longer than this
+MAX_COMMIT_LAG = 2.0
+
+# Batches at least this large are loaded with COPY instead of a multi-row INSERT
+COPY_THRESHOLD = 1000
+METRIC_COPY_THRESHOLD = 200
+
+
+def _candle_params(candle_data: Dict[str, Any]) -> tuple:
+    """Build the market_data parameter tuple for a candle, in CANDLE_COLUMNS order"""
+    values = list(map(candle_data.get, CANDLE_COLUMNS))
+    for i in _CANDLE_FLOAT_INDEXES:
+        if values[i] is not None:
+            values[i] = float(values[i])
+    return tuple(values)
+
+
+def _metric_params(metrics_data: Dict[str, Any]) -> tuple:
+    """Build the equity_data parameter tuple for a symbol's combined metrics, in METRIC_COLUMNS order"""
+    get = metrics_data.get
+    return tuple(get(key) if convert is None else convert(get(key)) for key, convert in _METRIC_PARAM_FIELDS)
+
 
 class MarketDataStore:
     """Class responsible for storing and managing market data"""
 
-    def __init__(self):
-        """Initialize the data store"""
-        db_connector = DatabaseConnector()
+    def __init__(self, flush_size: int = 500, flush_interval: float = 1.0):
+        """
+        Initialize the data store
+
+        Args:
+            flush_size: Number of buffered candle rows that triggers a flush
+            flush_interval: Maximum age in seconds of buffered candle rows before a flush
+        """
+        # Streaming candle writes and batch metric writes use separate pooled connections.
+        # Tick data can be re-downloaded, so the streaming connection trades a few seconds of
+        # durability for fewer commits and no wait on WAL flushes.
+        db_connector = DatabaseConnector(commit_every=4, synchronous_commit=False)
         db_connector.connect()
         self.db = db_connector
 
-        """Initialize the data store"""
-        self.market_data = {}
+        batch_db_connector = DatabaseConnector()
+        batch_db_connector.connect()
+        self.batch_db = batch_db_connector
+
+        # Candle rows are buffered and written through a prepared INSERT; single metric rows use one too
+        self.db.prepare(CANDLE_INSERT_STATEMENT, INSERT_CANDLE_SQL, len(CANDLE_COLUMNS))
+        self.batch_db.prepare(METRIC_INSERT_STATEMENT, INSERT_METRIC_SQL, len(METRIC_COLUMNS))
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._buffer: deque[tuple] = deque()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # The nightly metrics job and the scheduled partition rotation may use batch_db from different threads
+        self._batch_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._row_pool: deque[dict] = deque()
+
 
+    def get_row(self) -> Dict[str, Any]:
+        """Return an empty dictionary for building a candle row, reusing a released one when available"""
+        try:
+            row = self._row_pool.pop()
+        except IndexError:
+            return {}
+        row.clear()
+        return row
+
+    def release_row(self, row: Dict[str, Any]) -> None:
+        """Hand a candle dictionary back for reuse once it has been stored"""
+        if len(self._row_pool) < ROW_POOL_SIZE:
+            self._row_pool.append(row)
 
     def store_candle_data(self, candle_data: Dict[str, Any]) -> None:
         """
-        Store and process incoming market data.
+        Buffer incoming candle data, flushing to the database once the buffer is full or stale.
+
+        Args:
+            candle_data: Dictionary containing candle and market metric information
+        """
+        if self._buffer_row(_candle_params(candle_data)):
+            self.flush()
+
+    async def store_candle_data_async(self, candle_data: Dict[str, Any]) -> None:
+        """
+        Buffer incoming candle data, flushing on a worker thread so the event loop is not blocked.
 
         Args:
-            quote_data: Dictionary containing market data quote information
-        """
-        insert_sql = """
-                     INSERT INTO market_data (event_type, event_symbol, time, open, high, low, close, volume, \
-                                              bid_volume, ask_volume, imp_volatility, iv_index, iv_index_5_day_change, \
-                                              iv_index_rank, tos_iv_index_rank, tw_iv_index_rank, iv_percentile, \
-                                              liquidity_rating, beta, corr_spy_3month, liquidity_value, liquidity_rank) \
-                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) \
-                     """
-
-        # Parameters tuple for the INSERT statement
-        params = (
-            candle_data.get('event_type'),
-            candle_data.get('event_symbol'),
-            candle_data.get('time'),
-            candle_data.get('open'),
-            candle_data.get('high'),
-            candle_data.get('low'),
-            candle_data.get('close'),
-            None if candle_data['volume'] is None else float(candle_data['volume']),  # volume
-            None if candle_data['bid_volume'] is None else float(candle_data['bid_volume']),  # bid_volume
-            None if candle_data['ask_volume'] is None else float(candle_data['ask_volume']),  # ask_volume
-            None if candle_data['imp_volatility'] is None else float(candle_data['imp_volatility']),  # imp_volatility
-            candle_data.get('iv_index'),
-            candle_data.get('iv_index_5_day_change'),
-            candle_data.get('iv_index_rank'),
-            candle_data.get('tos_iv_index_rank'),
-            candle_data.get('tw_iv_index_rank'),
-            candle_data.get('iv_percentile'),
-            candle_data.get('liquidity_rating'),
-            candle_data.get('beta'),
-            candle_data.get('corr_spy_3month'),
-            candle_data.get('liquidity_value'),
-            candle_data.get('liquidity_rank')
-        )
-
-        # Execute the query using `self.db.execute_query`
+            candle_data: Dictionary containing candle and market metric information
+        """
+        if self._buffer_row(_candle_params(candle_data)):
+            await asyncio.to_thread(self.flush)
+
+    def _buffer_row(self, params: tuple) -> bool:
+        """Add a row to the candle buffer and report whether it is due for a flush"""
+        with self._buffer_lock:
+            self._buffer.append(params)
+            return (len(self._buffer) >= self._flush_size
+                    or time.monotonic() - self._last_flush >= self._flush_interval)
+
+    def flush(self) -> None:
+        """Write all buffered candle rows to the database in a single batch"""
+        # Flushes may run on worker threads; the connection's cursors must not be shared concurrently
+        with self._flush_lock:
+            with self._buffer_lock:
+                count = len(self._buffer)
+                self._last_flush = time.monotonic()
+
+            if not count:
+                return
+
+            # Drain exactly the rows present now; rows appended meanwhile wait for the next flush
+            rows = [self._buffer.popleft() for _ in range(count)]
+            try:
+                if count >= COPY_THRESHOLD:
+                    self.copy_candles(rows)
+                else:
+                    self.db.execute_prepared(CANDLE_INSERT_STATEMENT, rows, page_size=self._flush_size)
+            except Exception as e:
+                # One bad row fails the whole batch; retry individually so only the bad rows are lost
+                log.exception("Error inserting %s candle rows, retrying individually: %s", count, e)
+                self._store_candles_individually(rows)
+
+    def _store_candles_individually(self, rows: List[tuple]) -> None:
+        """Insert candle rows one at a time, logging and skipping any row that fails"""
+        for i, row in enumerate(rows):
+            connection = self.db.connection
+            if connection is None or connection.closed:
+                log.error("Database connection lost; dropping %s candle rows", len(rows) - i)
+                return
+            try:
+                self.db.execute_prepared(CANDLE_INSERT_STATEMENT, [row])
+            except Exception as e:
+                log.exception("Error inserting candle row for %s: %s", row[1], e)
+
+    def copy_candles(self, rows: Iterable[tuple]) -> None:
+        """
+        Bulk load candle rows into market_data using COPY.
+
+        Args:
+            rows: Parameter tuples in CANDLE_COLUMNS order
+        """
+        self.db.copy_rows('market_data', CANDLE_COLUMNS, rows)
+
+    async def run_periodic_flush(self) -> None:
+        """Flush buffered candle rows every flush interval until cancelled, bounding the commit lag"""
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await asyncio.to_thread(self._flush_and_commit)
+
+    def _flush_and_commit(self) -> None:
+        self.flush()
+        with self._flush_lock:
+            try:
+                self.db.commit_if_older_than(MAX_COMMIT_LAG)
+            except Exception as e:
+                log.exception("Error committing candle rows: %s", e)
+
+    def ensure_connected(self) -> None:
+        """Make sure both database connections are usable, reconnecting any that dropped"""
+        with self._flush_lock:
+            self.db.ensure_connected()
+        with self._batch_lock:
+            self.batch_db.ensure_connected()
+
+    def disconnect(self) -> None:
+        """Flush any buffered rows and release the database connections"""
         try:
-            self.db.execute_query(insert_sql, params=params)
-        except Exception as e:
-            print(f"Error inserting data: {e}")
+            self.flush()
+        finally:
+            try:
+                # A flush or commit may still be running on a worker thread after its task was cancelled
+                with self._flush_lock:
+                    self.db.disconnect()
+            finally:
+                with self._batch_lock:
+                    self.batch_db.disconnect()
 
     def store_metric_data(self, metrics_data: Dict[str, Any]) -> None:
         """
@@ -70,103 +260,109 @@ class MarketDataStore:
         Args:
             metrics_data: Dictionary containing combined metrics and market data information
         """
-        insert_sql = """
-                     INSERT INTO equity_data (symbol, bid, ask, last_price, close_price, volume, \
-                                              implied_volatility_index, implied_volatility_index_rank, \
-                                              implied_volatility_percentile, liquidity_rating, liquidity_value, \
-                                              implied_volatility_30_day, historical_volatility_30_day, \
-                                              iv_hv_30_day_difference, historical_volatility_60_day, \
-                                              historical_volatility_90_day, beta, earnings_expected_report_date, \
-                                              earnings_time_of_day) \
-                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) \
-                     """
-
-        # Parameters tuple for the INSERT statement
-        params = (
-            metrics_data.get('symbol'),
-            None if metrics_data.get('bid') is None else float(metrics_data.get('bid')),
-            None if metrics_data.get('ask') is None else float(metrics_data.get('ask')),
-            None if metrics_data.get('last_price') is None else float(metrics_data.get('last_price')),
-            None if metrics_data.get('close_price') is None else float(metrics_data.get('close_price')),
-            None if metrics_data.get('volume') is None else int(metrics_data.get('volume')),
-            None if metrics_data.get('iv_index') is None else float(metrics_data.get('iv_index')),
-            None if metrics_data.get('iv_rank') is None else float(metrics_data.get('iv_rank')),
-            None if metrics_data.get('iv_percentile') is None else float(metrics_data.get('iv_percentile')),
-            None if metrics_data.get('liquidity_rating') is None else float(metrics_data.get('liquidity_rating')),
-            None if metrics_data.get('liquidity_value') is None else float(metrics_data.get('liquidity_value')),
-            None if metrics_data.get('iv_30_day') is None else float(metrics_data.get('iv_30_day')),
-            None if metrics_data.get('hv_30_day') is None else float(metrics_data.get('hv_30_day')),
-            None if metrics_data.get('iv_hv_difference') is None else float(metrics_data.get('iv_hv_difference')),
-            None if metrics_data.get('hv_60_day') is None else float(metrics_data.get('hv_60_day')),
-            None if metrics_data.get('hv_90_day') is None else float(metrics_data.get('hv_90_day')),
-            None if metrics_data.get('beta') is None else float(metrics_data.get('beta')),
-            metrics_data.get('earnings_expected_date'),  # Date field, keep as-is
-            metrics_data.get('earnings_time_of_day')  # String field, keep as-is
-        )
-
-        # Execute the query using `self.db.execute_query`
+        # Execute the prepared INSERT on `self.batch_db`; a value that fails conversion only skips this symbol
         try:
-            self.db.execute_query(insert_sql, params=params)
-            print(f"Successfully stored metrics data for symbol: {metrics_data.get('symbol')}")
+            params = _metric_params(metrics_data)
+            with self._batch_lock:
+                self.batch_db.execute_prepared(METRIC_INSERT_STATEMENT, [params])
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Stored metrics for %s", metrics_data.get('symbol'))
         except Exception as e:
-            print(f"Error inserting metrics data for {metrics_data.get('symbol')}: {e}")
+            log.exception("Error inserting metrics data for %s: %s", metrics_data.get('symbol'), e)
 
 
-    def store_metric_data_history(self, symbol, data: list) -> None:
+    def store_candle_data_bulk(self, rows: List[Dict[str, Any]]) -> None:
         """
-        Store historical equity metrics and market data.
+        Store a batch of candles in one multi-row INSERT, bypassing the streaming buffer.
 
         Args:
-            :param symbol:
-            :param data:
+            rows: List of candle dictionaries in the format accepted by store_candle_data
         """
-        insert_sql = """
-                     INSERT INTO equity_data (symbol, close_price, volume, created_date)
-                     VALUES %s
-                     ON CONFLICT (symbol, created_date) DO NOTHING
-                     """
+        if not rows:
+            return
 
-        params_list = []
-        for item in data:
-            params_list.append(
-                (
-                    symbol,
-                    None if item.get('close') is None else float(item.get('close')),
-                    None if item.get('volume') is None else int(item.get('volume')),
-                    datetime.fromtimestamp(item.get('time') / 1000, tz=timezone.utc),
-                )
-            )
+        try:
+            params = [_candle_params(row) for row in rows]
+            with self._batch_lock:
+                self.batch_db.execute_many(INSERT_CANDLE_VALUES_SQL, params_iter=params, page_size=500)
+            log.info("Successfully stored %s candle rows", len(rows))
+        except Exception as e:
+            log.exception("Error inserting %s candle rows: %s", len(rows), e)
+
+    def store_metric_data_bulk(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Store equity metrics and market data for many symbols in one multi-row INSERT, or COPY for large batches.
+
+        Args:
+            rows: List of dictionaries in the format accepted by store_metric_data
+        """
+        if not rows:
+            return
 
         try:
-            self.db.execute_many(insert_sql, params_list=params_list, page_size=1000)
-            print(f"Successfully stored {len(params_list)} historical rows for symbol: {symbol}")
+            # Convert every row before writing so a bad value fails the batch before any page is sent
+            params = [_metric_params(row) for row in rows]
+            with self._batch_lock:
+                if len(rows) >= METRIC_COPY_THRESHOLD:
+                    self.batch_db.copy_rows('equity_data', METRIC_COLUMNS, params)
+                else:
+                    self.batch_db.execute_many(INSERT_METRIC_VALUES_SQL, params_iter=params, page_size=500)
+            log.info("Successfully stored metrics data for %s symbols", len(rows))
         except Exception as e:
-            print(f"Error inserting historical metrics data for {symbol}: {e}")
+            # One bad row fails the whole statement; fall back to per-symbol inserts so the rest are kept
+            log.exception("Error inserting metrics data for %s symbols, retrying individually: %s", len(rows), e)
+            for row in rows:
+                self.store_metric_data(row)
 
 
-    def get_stored_data(self, symbol: str = None) -> Dict[str, List[Dict[str, Any]]]:
+    def rotate_partitions(self, day: date = None) -> None:
         """
-        Retrieve stored market data for a specific symbol or all symbols.
+        Prepare the daily market_data partitions and make earlier days durable.
+
+        Requires migrations/001_market_data_daily_partitions.sql. Creates the UNLOGGED partitions for
+        `day` and the following day, and switches older UNLOGGED partitions to LOGGED.
 
         Args:
-            symbol: Optional symbol to retrieve data for. If None, returns all data.
+            day: Trading day to rotate to. Defaults to today in New York.
+        """
+        day = day or datetime.now(ZoneInfo('America/New_York')).date()
+        with self._batch_lock:
+            self.batch_db.execute_write("SELECT market_data_rotate_partitions(%s)", (day,))
+        log.info("Rotated market_data partitions for %s", day)
 
-        Returns:
-            Dictionary containing stored market data
+    def close_day(self, day: date = None) -> None:
+        """
+        End-of-day rotation: make `day` and every earlier partition durable and prepare the next day's.
+
+        Args:
+            day: Trading day that just finished. Defaults to today in New York.
         """
-        if symbol:
-            return {symbol: self.market_data.get(symbol, [])}
-        return self.market_data
+        day = day or datetime.now(ZoneInfo('America/New_York')).date()
+        self.rotate_partitions(day + timedelta(days=1))
 
 
-    def clear_data(self, symbol: str = None) -> None:
+    def store_metric_data_history(self, symbol, data: list) -> None:
         """
-        Clear the stored data for a specific symbol or all symbols.
+        Store historical equity metrics and market data.
 
         Args:
-            symbol: Optional symbol to clear data for. If None, clears all data.
+            :param symbol:
+            :param data:
         """
-        if symbol:
-            self.market_data.pop(symbol, None)
-        else:
-            self.market_data.clear()
+        params_list = []
+        for item in data:
+            params_list.append(
+                (
+                    symbol,
+                    None if item.get('close') is None else float(item.get('close')),
+                    None if item.get('volume') is None else int(item.get('volume')),
+                    datetime.fromtimestamp(item.get('time') / 1000, tz=timezone.utc),
+                )
+            )
+
+        try:
+            with self._batch_lock:
+                self.batch_db.execute_many(INSERT_METRIC_HISTORY_SQL, params_iter=params_list, page_size=1000)
+            log.info("Successfully stored %s historical rows for symbol: %s", len(params_list), symbol)
+        except Exception as e:
+            log.exception("Error inserting historical metrics data for %s: %s", symbol, e)
@@ -1,12 +1,32 @@
+import logging
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+
+# Shared session so repeated notifications reuse the kept-alive TLS connection to Pushover. POST is not in
+# Retry's default allowed methods, so only failures before the request is sent are retried
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                                       max_retries=Retry(total=3, backoff_factor=0.2)))
+
+# (token, user), read on first use since this module is imported before .env is loaded
+_credentials = None
+
 
 def send_pushover_notification(message):
-    pushover_token = os.getenv("PUSHOVER_TOKEN")  # Replace with your Pushover App Token or use environment variable
-    pushover_user = os.getenv("PUSHOVER_USER")    # Replace with your Pushover User Key or use environment variable
+    global _credentials
+    if _credentials is None:
+        _credentials = (os.getenv("PUSHOVER_TOKEN"),  # Replace with your Pushover App Token or use environment variable
+                        os.getenv("PUSHOVER_USER"))   # Replace with your Pushover User Key or use environment variable
+    pushover_token, pushover_user = _credentials
 
     if not pushover_token or not pushover_user:
-        print("Pushover credentials are not set. Skipping notification.")
+        log.warning("Pushover credentials are not set. Skipping notification.")
         return
 
     # Pushover notification payload
@@ -16,10 +36,14 @@ def send_pushover_notification(message):
         "message": message
     }
 
-    # Send the notification
-    response = requests.post("https://api.pushover.net/1/messages.json", data=payload)
+    # Send the notification; notifications are best effort and must never fail the caller
+    try:
+        response = _SESSION.post(PUSHOVER_URL, data=payload, timeout=5)
+    except requests.RequestException as e:
+        log.error("Failed to send notification: %s", e)
+        return
 
     if response.status_code == 200:
-        print("Pushover notification sent successfully.")
+        log.info("Pushover notification sent successfully.")
     else:
-        print(f"Failed to send notification: {response.status_code} - {response.text}")
+        log.error("Failed to send notification: %s - %s", response.status_code, response.text)
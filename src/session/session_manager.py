@@ -1,33 +1,71 @@
 from dotenv import load_dotenv
 import os
+import logging
+import time
 from tastytrade import OAuthSession
 from tastytrade.utils import now_in_new_york
 
+log = logging.getLogger(__name__)
+
+# .env is parsed once per process; the OAuth credentials are kept after the first successful read
+_DOTENV_LOADED = False
+_credentials = None
+
+# Seconds a session stays known-valid after a check, and the monotonic time of each session's next check
+SESSION_CHECK_TTL = 30.0
+_next_check: dict[int, float] = {}
+
+
+def _ensure_env():
+    """Load .env into the environment on first use"""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv(override=True)
+        _DOTENV_LOADED = True
+
+
+def _get_credentials():
+    """Return (client secret, refresh token), raising ValueError if either is missing"""
+    global _credentials
+    if _credentials is None:
+        _ensure_env()
+        client_secret = os.getenv("TT_OAUTH_CLIENT_SECRET", "")
+        refresh_token = os.getenv("TT_OAUTH_REFRESH_TOKEN", "")
+
+        if not client_secret or not refresh_token:
+            raise ValueError("Missing TT_OAUTH_CLIENT_SECRET or TT_OAUTH_REFRESH_TOKEN environment variables")
+
+        _credentials = (client_secret, refresh_token)
+    return _credentials
+
 
 def validate_session(session):
-    """Establish connection to Tastytrade and create a subscription."""
+    """Refresh the session if it has expired, skipping the check if it passed within SESSION_CHECK_TTL."""
+    key = id(session)
+    now = time.monotonic()
+    if now < _next_check.get(key, 0.0):
+        return
+
     try:
-        if now_in_new_york() > session.session_expiration:
+        current_time = now_in_new_york()
+        if current_time > session.session_expiration:
             session.refresh()
+        # Never skip a check past the point where the session expires
+        remaining = (session.session_expiration - current_time).total_seconds()
+        _next_check[key] = now + min(SESSION_CHECK_TTL, remaining)
     except Exception as e:
-        print(f"Error refreshing session: {e}")
+        log.exception("Error refreshing session: %s", e)
         raise
 
 
 def create_session() -> OAuthSession:
     """Establish connection to Tastytrade and create a subscription."""
     try:
-        print("Connecting to Tastytrade...")
-        load_dotenv(override=True)
-        clientSecret = os.getenv("TT_OAUTH_CLIENT_SECRET", "")
-        refreshToken = os.getenv("TT_OAUTH_REFRESH_TOKEN", "")
-
-        if not clientSecret or not refreshToken:
-            raise ValueError("Missing TT_OAUTH_CLIENT_SECRET or TT_OAUTH_REFRESH_TOKEN environment variables")
-
+        log.info("Connecting to Tastytrade...")
+        clientSecret, refreshToken = _get_credentials()
         session = OAuthSession(clientSecret, refreshToken)
         return session
 
     except Exception as e:
-        print(f"Error creating session: {e}")
+        log.exception("Error creating session: %s", e)
         raise
\ No newline at end of file
@@ -1,17 +1,92 @@
-from tastytrade.market_data import get_market_data_by_type
-from tastytrade.metrics import get_market_metrics
+from tastytrade.market_data import a_get_market_data_by_type
+from tastytrade.metrics import a_get_market_metrics
 from src.session.session_manager import validate_session
+import asyncio
 import time
 import math
+import logging
+from functools import partial
+from types import MappingProxyType
+
+log = logging.getLogger(__name__)
+
+# Read-only stand-in for a missing metrics / market data / earnings section
+_EMPTY = MappingProxyType({})
+
+# (metrics_dict key, source field) pairs copied from the metrics and market data sections
+_METRIC_FIELDS = (
+    ('iv_rank', 'implied_volatility_index_rank'),
+    ('iv_index', 'implied_volatility_index'),
+    ('iv_percentile', 'implied_volatility_percentile'),
+    ('liquidity_rating', 'liquidity_rating'),
+    ('liquidity_value', 'liquidity_value'),
+    ('iv_30_day', 'implied_volatility_30_day'),
+    ('hv_30_day', 'historical_volatility_30_day'),
+    ('iv_hv_difference', 'iv_hv_30_day_difference'),
+    ('beta', 'beta'),
+    ('hv_60_day', 'historical_volatility_60_day'),
+    ('hv_90_day', 'historical_volatility_90_day'),
+)
+_MARKET_DATA_FIELDS = (
+    ('bid', 'bid'),
+    ('ask', 'ask'),
+    ('last_price', 'last'),
+    ('close_price', 'prev_close'),
+    ('volume', 'volume'),
+)
+
+# Only the fields read when building metric rows are serialized; the models carry many more
+_METRIC_INCLUDE = {
+    **{field: True for _, field in _METRIC_FIELDS},
+    'earnings': {'expected_report_date': True, 'time_of_day': True},
+}
+_MARKET_DATA_INCLUDE = {field: True for _, field in _MARKET_DATA_FIELDS}
+
+
+def _dumper(sample, include):
+    """Return a serializer for the pydantic model class of `sample` (v2 or v1 API) limited to `include`"""
+    model = type(sample)
+    dump = model.model_dump if hasattr(model, 'model_dump') else model.dict
+    return partial(dump, include=include)
+
+
+class _RateLimiter:
+    """Token bucket allowing `rate_per_s` acquisitions per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate_per_s, burst=1):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Take a token, sleeping only as long as it takes for one to accrue"""
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate_per_s)
+            self.last_refill = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate_per_s)
+                self.tokens = 0.0
+                self.last_refill = time.monotonic()
+            else:
+                self.tokens -= 1
+
+
+# Symbols per API request, and how many requests may be in flight at once
+CHUNK_SIZE = 10
+MAX_CONCURRENT_REQUESTS = 8
 
 
 class EquityMetrics:
     def __init__(self, session, data_store):
         """
-        Initialize the MarketDataCombiner with a session.
+        Initialize the EquityMetrics collector with a session and data store.
 
         Args:
             session: OAuthSession instance for Tastytrade API.
+            data_store: MarketDataStore the gathered metrics are written to.
         """
         self.session = session
         self.data_store = data_store
@@ -28,116 +103,58 @@ class EquityMetrics:
         Returns:
             dict: Combined data keyed by symbol
         """
-        combined_data = {}
+        # Each list holds a single model type, so resolve its serializer once
+        dump_metric = _dumper(metrics_data[0], _METRIC_INCLUDE) if metrics_data else None
+        dump_equity = _dumper(market_data[0], _MARKET_DATA_INCLUDE) if market_data else None
 
-        # First, process all metrics data
-        for metric in metrics_data:
-            symbol = metric.symbol
-            combined_data[symbol] = {
+        # Index both lists by symbol, then build each symbol's entry once (metrics symbols first, in order)
+        metrics_by_symbol = {metric.symbol: dump_metric(metric) for metric in metrics_data}
+        market_data_by_symbol = {equity.symbol: dump_equity(equity) for equity in market_data}
+
+        combined_data = {
+            symbol: {
                 'symbol': symbol,
-                'metrics': metric.model_dump() if hasattr(metric, 'model_dump') else metric.dict(),
-                'market_data': None
+                'metrics': metrics_by_symbol.get(symbol),
+                'market_data': market_data_by_symbol.get(symbol)
             }
-
-        # Then, add matching market data
-        for equity in market_data:
-            symbol = equity.symbol
-            if symbol in combined_data:
-                # Symbol exists in metrics, add market data
-                combined_data[symbol]['market_data'] = equity.model_dump() if hasattr(equity,
-                                                                                      'model_dump') else equity.dict()
-            else:
-                # Symbol only exists in market data, create a new entry
-                combined_data[symbol] = {
-                    'symbol': symbol,
-                    'metrics': None,
-                    'market_data': equity.model_dump() if hasattr(equity, 'model_dump') else equity.dict()
-                }
+            for symbol in dict.fromkeys([*metrics_by_symbol, *market_data_by_symbol])
+        }
 
         return combined_data
 
-    @staticmethod
-    def _chunk_symbols(symbols_list, chunk_size=10):
-        """
-        Split symbols list into chunks of specified size.
-
-        Args:
-            symbols_list: List of symbols to chunk
-            chunk_size: Maximum size of each chunk (default 10)
-
-        Returns:
-            Generator yielding chunks of symbols
-        """
-        for i in range(0, len(symbols_list), chunk_size):
-            yield symbols_list[i:i + chunk_size]
-
-    def _fetch_metrics_in_batches(self, symbols_list, delay_between_calls=0.1):
-        """
-        Fetch market metrics in batches to handle API limitations.
-
-        Args:
-            symbols_list: List of symbols to fetch metrics for
-            delay_between_calls: Delay in seconds between API calls to avoid rate limiting
-
-        Returns:
-            List of all metrics data
+    async def _fetch_chunk_async(self, chunk, semaphore, limiter=None):
         """
-        all_metrics = []
-        chunks = list(self._chunk_symbols(symbols_list, 10))
-
-        print(f"  Fetching metrics for {len(symbols_list)} symbols in {len(chunks)} batches...")
-
-        for i, chunk in enumerate(chunks, 1):
-            try:
-                print(f"    Metrics batch {i}/{len(chunks)}: {len(chunk)} symbols")
-                metrics_data = get_market_metrics(self.session, chunk)
-                all_metrics.extend(metrics_data)
-
-                # Add delay between calls to avoid rate limiting (except for the last call)
-                if i < len(chunks) and delay_between_calls > 0:
-                    time.sleep(delay_between_calls)
-
-            except Exception as e:
-                print(f"    Error fetching metrics for batch {i}: {e}")
-                # Continue with other batches even if one fails
-                continue
-
-        return all_metrics
-
-    def _fetch_market_data_in_batches(self, symbols_list, delay_between_calls=0.1):
-        """
-        Fetch market data in batches to handle API limitations.
+        Fetch market metrics and market data for one chunk of symbols concurrently.
 
         Args:
-            symbols_list: List of symbols to fetch market data for
-            delay_between_calls: Delay in seconds between API calls to avoid rate limiting
+            chunk: List of symbols to fetch (at most CHUNK_SIZE)
+            semaphore: Semaphore bounding the number of chunks in flight
+            limiter: Optional _RateLimiter pacing the chunk requests
 
         Returns:
-            List of all market data
+            tuple: (metrics data list, market data list); an endpoint that failed contributes an empty list
         """
-        all_market_data = []
-        chunks = list(self._chunk_symbols(symbols_list, 10))
-
-        print(f"  Fetching market data for {len(symbols_list)} symbols in {len(chunks)} batches...")
-
-        for i, chunk in enumerate(chunks, 1):
-            try:
-                print(f"    Market data batch {i}/{len(chunks)}: {len(chunk)} symbols")
-                market_data = get_market_data_by_type(self.session, equities=chunk)
-                all_market_data.extend(market_data)
-
-                # Add delay between calls to avoid rate limiting (except for the last call)
-                if i < len(chunks) and delay_between_calls > 0:
-                    time.sleep(delay_between_calls)
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            metrics_data, market_data = await asyncio.gather(
+                a_get_market_metrics(self.session, chunk),
+                a_get_market_data_by_type(self.session, equities=chunk),
+                return_exceptions=True
+            )
 
-            except Exception as e:
-                print(f"    Error fetching market data for batch {i}: {e}")
-                # Continue with other batches even if one fails
-                continue
+        # Continue with the other chunks even if one fails
+        if isinstance(metrics_data, Exception):
+            log.error("    Error fetching metrics for %s: %s", chunk, metrics_data, exc_info=metrics_data)
+            metrics_data = []
+        if isinstance(market_data, Exception):
+            log.error("    Error fetching market data for %s: %s", chunk, market_data, exc_info=market_data)
+            market_data = []
 
-        return all_market_data
+        return metrics_data, market_data
 
-    def _process_symbol_batch(self, symbols_batch, batch_number, total_batches, delay_between_calls=0.1):
+    async def _process_symbol_batch(self, symbols_batch, batch_number, total_batches, semaphore, limiter=None,
+                                    verbose=True):
         """
         Process a single batch of symbols (up to 50).
 
@@ -145,82 +162,96 @@ class EquityMetrics:
             symbols_batch: List of symbols to process (max 50)
             batch_number: Current batch number for logging
             total_batches: Total number of batches for logging
-            delay_between_calls: Delay between individual API calls within this batch
+            semaphore: Semaphore bounding the number of API requests in flight
+            limiter: Optional _RateLimiter pacing the API calls within this batch
+            verbose: Whether to log per-batch progress information (default True)
 
         Returns:
             dict: Combined data for this batch
         """
-        print(f"Processing batch {batch_number}/{total_batches}: {len(symbols_batch)} symbols")
+        if verbose:
+            log.info("Processing batch %s/%s: %s symbols", batch_number, total_batches, len(symbols_batch))
         batch_start_time = time.time()
 
-        # Get both market metrics (IV data) and market data (price info) in batches
-        metrics_data = self._fetch_metrics_in_batches(symbols_batch, delay_between_calls)
-        market_data = self._fetch_market_data_in_batches(symbols_batch, delay_between_calls)
+        # Get both market metrics (IV data) and market data (price info) for every chunk at once
+        if verbose:
+            log.info("  Fetching metrics and market data for %s symbols in %s chunks...", len(symbols_batch),
+                     math.ceil(len(symbols_batch) / CHUNK_SIZE))
+        results = await asyncio.gather(*(self._fetch_chunk_async(symbols_batch[i:i + CHUNK_SIZE], semaphore, limiter)
+                                         for i in range(0, len(symbols_batch), CHUNK_SIZE)))
+        metrics_data = [metric for chunk_metrics, _ in results for metric in chunk_metrics]
+        market_data = [equity for _, chunk_market_data in results for equity in chunk_market_data]
 
         # Combine the data for this batch
         batch_combined_data = self._combine_data(metrics_data, market_data)
 
-        # Store each symbol's data
-        symbols_processed = 0
+        # Build each symbol's row, then store the whole batch at once
+        metrics_rows = []
         for symbol, data in batch_combined_data.items():
             try:
-                # Extract earnings data safely
-                earnings = data['metrics'].get('earnings') if data['metrics'] else None
+                metrics = data['metrics'] or _EMPTY
+                market = data['market_data'] or _EMPTY
+                earnings = metrics.get('earnings') or _EMPTY
 
                 metrics_dict = {
                     'symbol': symbol,
-                    # From metrics
-                    'iv_rank': data['metrics'].get('implied_volatility_index_rank') if data['metrics'] else None,
-                    'iv_index': data['metrics'].get('implied_volatility_index') if data['metrics'] else None,
-                    'iv_percentile': data['metrics'].get('implied_volatility_percentile') if data['metrics'] else None,
-                    'liquidity_rating': data['metrics'].get('liquidity_rating') if data['metrics'] else None,
-                    'liquidity_value': data['metrics'].get('liquidity_value') if data['metrics'] else None,
-                    'iv_30_day': data['metrics'].get('implied_volatility_30_day') if data['metrics'] else None,
-                    'hv_30_day': data['metrics'].get('historical_volatility_30_day') if data['metrics'] else None,
-                    'iv_hv_difference': data['metrics'].get('iv_hv_30_day_difference') if data['metrics'] else None,
-                    'beta': data['metrics'].get('beta') if data['metrics'] else None,
-                    'hv_60_day': data['metrics'].get('historical_volatility_60_day') if data['metrics'] else None,
-                    'hv_90_day': data['metrics'].get('historical_volatility_90_day') if data['metrics'] else None,
-                    'earnings_expected_date': earnings.get('expected_report_date') if earnings else None,
-                    'earnings_time_of_day': earnings.get('time_of_day') if earnings else None,
-
-                    # From market_data
-                    'bid': data['market_data'].get('bid') if data['market_data'] else None,
-                    'ask': data['market_data'].get('ask') if data['market_data'] else None,
-                    'last_price': data['market_data'].get('last') if data['market_data'] else None,
-                    'close_price': data['market_data'].get('prev_close') if data['market_data'] else None,
-                    'volume': data['market_data'].get('volume') if data['market_data'] else None,
+                    **{key: metrics.get(field) for key, field in _METRIC_FIELDS},
+                    'earnings_expected_date': earnings.get('expected_report_date'),
+                    'earnings_time_of_day': earnings.get('time_of_day'),
+                    **{key: market.get(field) for key, field in _MARKET_DATA_FIELDS},
                 }
             except KeyError as e:
-                print(f"Error processing symbol '{symbol}': Missing required key {e}")
+                log.exception("Error processing symbol '%s': Missing required key %s", symbol, e)
                 # You can either skip this symbol or create a minimal metrics_dict
                 metrics_dict = {'symbol': symbol}  # Minimal fallback
                 # Or you could re-raise to stop processing: raise
             except TypeError as e:
-                print(f"Error processing symbol '{symbol}': Data type error - {e}")
+                log.exception("Error processing symbol '%s': Data type error - %s", symbol, e)
                 metrics_dict = {'symbol': symbol}  # Minimal fallback
             except Exception as e:
-                print(f"Error processing symbol '{symbol}': Unexpected error - {e}")
+                log.exception("Error processing symbol '%s': Unexpected error - %s", symbol, e)
                 metrics_dict = {'symbol': symbol}  # Minimal fallback
 
-            # Store the data
-            self.data_store.store_metric_data(metrics_dict)
-            symbols_processed += 1
+            metrics_rows.append(metrics_dict)
+
+        # The database write is blocking, so keep it off the event loop
+        await asyncio.to_thread(self.data_store.store_metric_data_bulk, metrics_rows)
+        symbols_processed = len(metrics_rows)
 
         batch_end_time = time.time()
         batch_duration = batch_end_time - batch_start_time
 
-        print(f"  Batch {batch_number} completed in {batch_duration:.2f}s")
-        print(f"  Processed: {symbols_processed} symbols")
-        print(f"  Symbols with metrics: {sum(1 for data in batch_combined_data.values() if data['metrics'])}")
-        print(f"  Symbols with market data: {sum(1 for data in batch_combined_data.values() if data['market_data'])}")
+        if verbose:
+            log.info("  Batch %s completed in %.2fs", batch_number, batch_duration)
+            log.info("  Processed: %s symbols", symbols_processed)
+            log.info("  Symbols with metrics: %s", sum(1 for data in batch_combined_data.values() if data['metrics']))
+            log.info("  Symbols with market data: %s",
+                     sum(1 for data in batch_combined_data.values() if data['market_data']))
 
         return batch_combined_data
 
     def gather_metrics(self, symbols_list, symbols_per_batch=50, delay_between_calls=0.1, delay_between_batches=1.0,
                        verbose=True):
         """
-        Fetch market metrics and market data in manageable batches, combine them, and store the results.
+        Blocking wrapper around gather_metrics_async for callers without a running event loop.
+
+        Args:
+            symbols_list: List of symbols to fetch data for
+            symbols_per_batch: Maximum number of symbols to process in each batch (default 50)
+            delay_between_calls: Delay in seconds between individual API calls within a batch (default 0.1)
+            delay_between_batches: Delay in seconds between processing each batch (default 1.0)
+            verbose: Whether to print detailed progress information (default True)
+
+        Returns:
+            int: Number of symbols processed
+        """
+        return asyncio.run(self.gather_metrics_async(symbols_list, symbols_per_batch, delay_between_calls,
+                                                     delay_between_batches, verbose))
+
+    async def gather_metrics_async(self, symbols_list, symbols_per_batch=50, delay_between_calls=0.1,
+                                   delay_between_batches=1.0, verbose=True):
+        """
+        Fetch, combine and store market metrics and market data for all symbols without retaining the results.
 
         Args:
             symbols_list: List of symbols to fetch data for
@@ -230,22 +261,48 @@ class EquityMetrics:
             verbose: Whether to print detailed progress information (default True)
 
         Returns:
-            dict: Combined data for all symbols
+            int: Number of symbols processed
+        """
+        symbols_processed = 0
+        async for batch_combined_data in self.iter_metrics_async(symbols_list, symbols_per_batch, delay_between_calls,
+                                                                 delay_between_batches, verbose):
+            symbols_processed += len(batch_combined_data)
+        return symbols_processed
+
+    async def iter_metrics_async(self, symbols_list, symbols_per_batch=50, delay_between_calls=0.1,
+                                 delay_between_batches=1.0, verbose=True):
+        """
+        Fetch market metrics and market data in manageable batches, combine and store them, and yield each batch.
+
+        Each batch is stored before it is yielded, so callers only need to keep the batches they use.
+
+        Args:
+            symbols_list: List of symbols to fetch data for
+            symbols_per_batch: Maximum number of symbols to process in each batch (default 50)
+            delay_between_calls: Delay in seconds between individual API calls within a batch (default 0.1)
+            delay_between_batches: Delay in seconds between processing each batch (default 1.0)
+            verbose: Whether to print detailed progress information (default True)
+
+        Yields:
+            dict: Combined data for one batch of symbols, keyed by symbol
         """
         # Validate the session
-        validate_session(self.session)
+        await asyncio.to_thread(validate_session, self.session)
 
         total_symbols = len(symbols_list)
         total_batches = math.ceil(total_symbols / symbols_per_batch)
 
         if verbose:
-            print(f"Starting data collection for {total_symbols} symbols...")
-            print(f"Processing in {total_batches} batches of up to {symbols_per_batch} symbols each")
-            print(f"Delay between API calls: {delay_between_calls}s")
-            print(f"Delay between batches: {delay_between_batches}s")
+            log.info("Starting data collection for %s symbols...", total_symbols)
+            log.info("Processing in %s batches of up to %s symbols each", total_batches, symbols_per_batch)
+            log.info("Delay between API calls: %ss", delay_between_calls)
+            log.info("Delay between batches: %ss", delay_between_batches)
 
         start_time = time.time()
-        all_combined_data = {}
+        symbols_processed = symbols_with_metrics = symbols_with_market_data = 0
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # One request per endpoint every delay_between_calls on average; a slow response already uses up its slot
+        limiter = _RateLimiter(1 / delay_between_calls) if delay_between_calls > 0 else None
 
         # Process symbols in batches
         for batch_num in range(total_batches):
@@ -254,32 +311,38 @@ class EquityMetrics:
             symbols_batch = symbols_list[batch_start_idx:batch_end_idx]
 
             # Process this batch
-            batch_combined_data = self._process_symbol_batch(
+            batch_combined_data = await self._process_symbol_batch(
                 symbols_batch,
                 batch_num + 1,
                 total_batches,
-                delay_between_calls
+                semaphore,
+                limiter,
+                verbose
             )
 
-            # Add batch results to overall results
-            all_combined_data.update(batch_combined_data)
+            # Keep running totals for the summary rather than the batch itself
+            symbols_processed += len(batch_combined_data)
+            if verbose:
+                symbols_with_metrics += sum(1 for data in batch_combined_data.values() if data['metrics'])
+                symbols_with_market_data += sum(1 for data in batch_combined_data.values() if data['market_data'])
+
+            yield batch_combined_data
+            del batch_combined_data
 
             # Add delay between batches (except for the last batch)
             if batch_num < total_batches - 1 and delay_between_batches > 0:
                 if verbose:
-                    print(f"  Waiting {delay_between_batches}s before next batch...")
-                time.sleep(delay_between_batches)
-
+                    log.info("  Waiting %ss before next batch...", delay_between_batches)
+                await asyncio.sleep(delay_between_batches)
         end_time = time.time()
         total_duration = end_time - start_time
 
         if verbose:
-            print(f"\n=== DATA COLLECTION SUMMARY ===")
-            print(f"Total processing time: {total_duration:.2f} seconds")
-            print(f"Total symbols processed: {len(all_combined_data)}")
-            print(f"Symbols with metrics: {sum(1 for data in all_combined_data.values() if data['metrics'])}")
-            print(f"Symbols with market data: {sum(1 for data in all_combined_data.values() if data['market_data'])}")
-            print(f"Average time per symbol: {total_duration / len(all_combined_data):.3f}s")
-            print(f"Batches processed: {total_batches}")
-
-        return all_combined_data
\ No newline at end of file
+            log.info("=== DATA COLLECTION SUMMARY ===")
+            log.info("Total processing time: %.2f seconds", total_duration)
+            log.info("Total symbols processed: %s", symbols_processed)
+            log.info("Symbols with metrics: %s", symbols_with_metrics)
+            log.info("Symbols with market data: %s", symbols_with_market_data)
+            if symbols_processed:
+                log.info("Average time per symbol: %.3fs", total_duration / symbols_processed)
+            log.info("Batches processed: %s", total_batches)
@@ -1,14 +1,15 @@
-from typing import Any, Coroutine
-
 from dotenv import load_dotenv
 from os import getenv
 import asyncio
+import logging
 from tastytrade import OAuthSession
 from tastytrade import DXLinkStreamer
 from tastytrade.dxfeed import Candle
-from tastytrade.metrics import get_market_metrics
+from tastytrade.metrics import a_get_market_metrics
 from datetime import datetime
 
+log = logging.getLogger(__name__)
+
 
 class MarketDataSubscription:
     def __init__(self, session, symbols, data_store):
@@ -37,7 +38,7 @@ class MarketDataSubscription:
             if self.streamer:
                 await self.stop()
 
-            print("Connecting to Tastytrade...")
+            log.info("Connecting to Tastytrade...")
             clientSecret = getenv("TT_OAUTH_CLIENT_SECRET", "")
             refreshToken = getenv("TT_OAUTH_REFRESH_TOKEN", "")
 
@@ -63,10 +64,10 @@ class MarketDataSubscription:
             # Start listening in the background
             self.listen_task = asyncio.create_task(self._listen_for_data())
 
-            print(f"Successfully subscribed to symbols: {self.symbols}")
+            log.info("Successfully subscribed to symbols: %s", self.symbols)
 
         except Exception as e:
-            print(f"Error during connection: {e}")
+            log.exception("Error during connection: %s", e)
             await self.cleanup()
             raise
 
@@ -79,19 +80,19 @@ class MarketDataSubscription:
                     break
 
                 try:
-                    self.on_candle(candle)
+                    await self.on_candle(candle)
                 except Exception as e:
-                    print(f"Error processing candle data: {e}")
+                    log.exception("Error processing candle data: %s", e)
 
         except asyncio.CancelledError:
-            print("Data listening task was cancelled")
+            log.info("Data listening task was cancelled")
         except Exception as e:
-            print(f"Error in data listening loop: {e}")
+            log.exception("Error in data listening loop: %s", e)
 
 
     async def stop(self):
         """Stop the subscription and clean up resources gracefully."""
-        print("Stopping market data subscription...")
+        log.info("Stopping market data subscription...")
 
         try:
             # Set flag to stop listening
@@ -103,23 +104,45 @@ class MarketDataSubscription:
                 try:
                     await self.listen_task
                 except asyncio.CancelledError:
-                    print("Listen task cancelled successfully")
+                    log.info("Listen task cancelled successfully")
 
             # Unsubscribe from symbols
             if self.streamer and self.symbols:
                 try:
                     await self.streamer.unsubscribe(Candle, self.symbols)
-                    print(f"Unsubscribed from symbols: {self.symbols}")
+                    log.info("Unsubscribed from symbols: %s", self.symbols)
                 except Exception as e:
-                    print(f"Error unsubscribing from symbols: {e}")
+                    log.exception("Error unsubscribing from symbols: %s", e)
 
             # Close the streamer
             await self.cleanup()
 
-            print("Market data subscription stopped successfully")
+            log.info("Market data subscription stopped successfully")
 
         except Exception as e:
-            print(f"Error during stop: {e}")
+            log.exception("Error during stop: %s", e)
+
+
+    async def update_symbols(self, add=(), remove=()):
+        """
+        Change the live subscription without reconnecting.
+
+        Args:
+            add: Symbols to start streaming candles for.
+            remove: Symbols to stop streaming candles for.
+        """
+        add = [symbol for symbol in add if symbol not in self.symbols]
+        remove = [symbol for symbol in remove if symbol in self.symbols]
+
+        if remove:
+            await self.streamer.unsubscribe(Candle, remove)
+            self.symbols = [symbol for symbol in self.symbols if symbol not in remove]
+            log.info("Unsubscribed from symbols: %s", remove)
+
+        if add:
+            await self.streamer.subscribe(Candle, add, self.update_interval)
+            self.symbols = self.symbols + add
+            log.info("Subscribed to symbols: %s", add)
 
 
     async def cleanup(self):
@@ -128,9 +151,9 @@ class MarketDataSubscription:
             if self.streamer:
                 try:
                     await self.streamer.__aexit__(None, None, None)
-                    print("Streamer closed successfully")
+                    log.info("Streamer closed successfully")
                 except Exception as e:
-                    print(f"Error closing streamer: {e}")
+                    log.exception("Error closing streamer: %s", e)
                 finally:
                     self.streamer = None
 
@@ -138,56 +161,57 @@ class MarketDataSubscription:
             self.session = None
 
         except Exception as e:
-            print(f"Error during cleanup: {e}")
+            log.exception("Error during cleanup: %s", e)
 
     def on_quote(self, quote_data):
         """Callback function to handle incoming quote data."""
         try:
             self.data_store.store_data(quote_data)
         except Exception as e:
-            print(f"Error processing quote data: {e}")
+            log.exception("Error processing quote data: %s", e)
 
-    def on_candle(self, candle_data):
+    async def on_candle(self, candle_data):
         """Callback function to handle incoming candle data."""
         try:
             # get metric data
-            m_data = get_market_metrics(self.session, [candle_data.event_symbol])
-
-            # Convert a candle object to the dictionary format expected by store
-            candle_dict = {
-                'event_type': 'Candle',
-                'event_symbol': candle_data.event_symbol,
-                'time': candle_data.time,
-                'open': candle_data.open,
-                'high': candle_data.high,
-                'low': candle_data.low,
-                'close': candle_data.close,
-                'volume': candle_data.volume,
-                'bid_volume': candle_data.bid_volume,
-                'ask_volume': candle_data.ask_volume,
-                'imp_volatility': candle_data.imp_volatility,
-            }
-
-            # add the market metric data
-            if m_data:
-                candle_dict.update({
-                    'iv_index': m_data[0].implied_volatility_index,
-                    'iv_index_5_day_change': m_data[0].implied_volatility_index_5_day_change,
-                    'iv_index_rank': m_data[0].implied_volatility_index_rank,
-                    'tos_iv_index_rank': m_data[0].tos_implied_volatility_index_rank,
-                    'tw_iv_index_rank': m_data[0].tw_implied_volatility_index_rank,
-                    'iv_percentile': m_data[0].implied_volatility_percentile,
-                    'liquidity_rating': m_data[0].liquidity_rating,
-                    'beta': m_data[0].beta,
-                    'corr_spy_3month': m_data[0].corr_spy_3month,
-                    'liquidity_value': m_data[0].liquidity_value,
-                    'liquidity_rank': m_data[0].liquidity_rank,
-                })
-
-            # print(candle_dict)
-            self.data_store.store_candle_data(candle_dict)
+            m_data = await a_get_market_metrics(self.session, [candle_data.event_symbol])
+
+            # Fill a pooled dictionary in the format expected by store instead of allocating one per tick
+            candle_dict = self.data_store.get_row()
+            try:
+                candle_dict['event_type'] = 'Candle'
+                candle_dict['event_symbol'] = candle_data.event_symbol
+                candle_dict['time'] = candle_data.time
+                candle_dict['open'] = candle_data.open
+                candle_dict['high'] = candle_data.high
+                candle_dict['low'] = candle_data.low
+                candle_dict['close'] = candle_data.close
+                candle_dict['volume'] = candle_data.volume
+                candle_dict['bid_volume'] = candle_data.bid_volume
+                candle_dict['ask_volume'] = candle_data.ask_volume
+                candle_dict['imp_volatility'] = candle_data.imp_volatility
+
+                # add the market metric data
+                if m_data:
+                    metric = m_data[0]
+                    candle_dict['iv_index'] = metric.implied_volatility_index
+                    candle_dict['iv_index_5_day_change'] = metric.implied_volatility_index_5_day_change
+                    candle_dict['iv_index_rank'] = metric.implied_volatility_index_rank
+                    candle_dict['tos_iv_index_rank'] = metric.tos_implied_volatility_index_rank
+                    candle_dict['tw_iv_index_rank'] = metric.tw_implied_volatility_index_rank
+                    candle_dict['iv_percentile'] = metric.implied_volatility_percentile
+                    candle_dict['liquidity_rating'] = metric.liquidity_rating
+                    candle_dict['beta'] = metric.beta
+                    candle_dict['corr_spy_3month'] = metric.corr_spy_3month
+                    candle_dict['liquidity_value'] = metric.liquidity_value
+                    candle_dict['liquidity_rank'] = metric.liquidity_rank
+
+                # The store copies the values into its own row tuple, so the dictionary can be reused afterwards
+                await self.data_store.store_candle_data_async(candle_dict)
+            finally:
+                self.data_store.release_row(candle_dict)
         except Exception as e:
-            print(f"Error processing candle data: {e}")
+            log.exception("Error processing candle data: %s", e)
 
     async def __aenter__(self):
         """Async context manager entry"""
@@ -230,7 +254,7 @@ class MarketDataSubscription:
                     try:
                         candle = await asyncio.wait_for(anext(candle_iter), timeout=3.0)
                     except asyncio.TimeoutError:
-                        print("No candles received in 3 seconds; breaking out.")
+                        log.info("No candles received in 3 seconds; breaking out.")
                         break
 
                     symbol = candle.event_symbol.split('{')[0]
@@ -1,9 +1,11 @@
-from tastytrade.instruments import get_option_chain
+import logging
 from tastytrade.instruments import NestedOptionChain
 from tastytrade.metrics import get_market_metrics
 from src.session.session_manager import validate_session
 from datetime import datetime, timedelta
 
+log = logging.getLogger(__name__)
+
 
 class OptionChainRetriever:
     def __init__(self, session):
@@ -45,13 +47,13 @@ class OptionChainRetriever:
             current_price = 6700
             target_strike = current_price + price_offset
 
-            print(f"Current {symbol} price: ${current_price:.2f}")
-            print(f"Target strike around: ${target_strike:.2f}")
+            log.info("Current %s price: $%.2f", symbol, current_price)
+            log.info("Target strike around: $%.2f", target_strike)
 
             # Get option chain
             #option_chain = get_option_chain(self.session, symbol)
             option_chain = NestedOptionChain.get(self.session, symbol)
-            print(option_chain[0].expirations[0].strikes)
+            log.info("%s", option_chain[0].expirations[0].strikes)
 
             # Filter for call options near target strike
             target_calls = []
@@ -96,7 +98,7 @@ class OptionChainRetriever:
             return target_calls
 
         except Exception as e:
-            print(f"Error retrieving option chain: {e}")
+            log.exception("Error retrieving option chain: %s", e)
             raise
 
     def get_closest_call_strike_above_price(self, symbol: str, price_offset: float = 100.0):
@@ -1,6 +1,9 @@
+import logging
 from typing import List, Set
 from tastytrade.watchlists import PublicWatchlist
 
+log = logging.getLogger(__name__)
+
 
 class WatchListManager:
     def __init__(self, session, data_store):
@@ -18,9 +21,9 @@ class WatchListManager:
 
             # val = self.extract_equity_symbols_from_watchlists(public_watchlist)
             val = self.extract_equity_symbols_detailed(public_watchlist)
-            print(sorted(val))
+            log.info("%s", sorted(val))
         except Exception as e:
-            print(f"Error loading watch lists: {e}")
+            log.exception("Error loading watch lists: %s", e)
             return
 
 
@@ -0,0 +1,38 @@
+"""
+Validate the symbol files and pre-populate the symbols cache.
+
+Run at image build time so the container never parses YAML at runtime:
+
+    python -m tools.compile_symbols [files...]
+
+Each file is parsed once and written to SYMBOLS_CACHE_DIR as a pickle keyed by its path, mtime and size;
+load_symbols() then reads the pickle directly. Exits non-zero if any file is missing or invalid.
+"""
+import logging
+import sys
+
+from src.app.symbols import SYMBOLS_CACHE_DIR, load_symbols
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FILES = ('streaming-symbols.yaml', 'nightly-symbols.yaml')
+
+
+def main(files) -> int:
+    failed = False
+    for source_file in files:
+        try:
+            symbols = load_symbols(source_file)
+            counts = ', '.join(f"{group}={len(items)}" for group, items in symbols.items())
+            log.info("Compiled %s (%s)", source_file, counts)
+        except (FileNotFoundError, ValueError) as err:
+            log.error("%s", err)
+            failed = True
+
+    log.info("Symbols cache directory: %s", SYMBOLS_CACHE_DIR)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    sys.exit(main(sys.argv[1:] or DEFAULT_FILES))